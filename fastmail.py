@@ -1,14 +1,19 @@
 """Shared module for Fastmail JMAP client operations."""
 
 import re
+import time
+import functools
 import logging
+import threading
+from itertools import chain
 from dataclasses import dataclass
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
+from urllib3.util.retry import Retry
 from jmapc import (
     Client,
     Comparator,
     EmailQueryFilterCondition,
-    MailboxQueryFilterCondition,
     Ref,
 )
 from jmapc.methods import (
@@ -16,15 +21,43 @@ from jmapc.methods import (
     EmailQuery,
     MailboxGet,
     MailboxGetResponse,
-    MailboxQuery,
 )
 
 FASTMAIL_API_HOST = "api.fastmail.com/jmap/session"
 
+# Seconds to reuse a mailbox ID before looking it up on the server again
+MAILBOX_CACHE_TTL = 3600
+
+# Seconds to reuse a client (and its JMAP session) before creating a new one
+CLIENT_CACHE_TTL = 1800
+
+# Clients kept at once; the oldest is dropped when the cache is full
+CLIENT_CACHE_SIZE = 32
+
+# Email properties needed to build an Email for list and search results
+EMAIL_LIST_PROPERTIES = ["id", "from", "subject", "receivedAt"]
+
+# Emails whose text content is kept in memory; each can be up to 1 MiB
+EMAIL_CONTENT_CACHE_SIZE = 64
+
+# Keep-alive connections per client; tool calls run in parallel worker threads
+HTTP_POOL_SIZE = 20
+
 logger = logging.getLogger(__name__)
 
+# Whitespace patterns used by normalize_whitespace
+_WS_RE = re.compile(r"[ \t]+")
+_NL_RE = re.compile(r"\n+")
 
-@dataclass
+# (account id, role) -> (lookup time, mailbox id)
+_mailbox_id_cache: dict[tuple[str, str], tuple[float, str]] = {}
+
+# API token -> (creation time, client), ordered oldest first
+_client_cache: dict[str, tuple[float, Client]] = {}
+_client_cache_lock = threading.Lock()
+
+
+@dataclass(slots=True)
 class EmailPage:
     """Data class to represent a page of emails."""
 
@@ -33,7 +66,7 @@ class EmailPage:
     total: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Email:
     """Data class to represent an email."""
 
@@ -48,6 +81,10 @@ class MailboxNotFound(Exception):
     """Exception raised when the mailbox is not found on the server."""
 
 
+class EmailNotFound(Exception):
+    """Exception raised when the email is not found on the server."""
+
+
 def format_addresses(addresses: list) -> str:
     """Format email addresses for display."""
     return ", ".join(
@@ -58,74 +95,120 @@ def format_addresses(addresses: list) -> str:
 
 def normalize_whitespace(text):
     """Normalize whitespace in a string."""
+    # Skip both regex passes when there are no runs to collapse
+    if "  " not in text and "\t" not in text and "\n\n" not in text:
+        return text.strip()
     # Replace multiple spaces or tabs with a single space
-    text = re.sub(r"[ \t]+", " ", text)
+    text = _WS_RE.sub(" ", text)
     # Replace multiple newlines with a single newline
-    text = re.sub(r"\n+", "\n", text)
+    text = _NL_RE.sub("\n", text)
     # Strip leading/trailing whitespace
     return text.strip()
 
 
+def html_to_text(html: str) -> str:
+    """Extract the visible text from an HTML document."""
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(["script", "style"])
+    if tree.body is None:
+        return ""
+    return tree.body.text()
+
+
 def get_body_as_text(email) -> str:
     """Convert body values to text."""
     if not email.body_values:
         return ""
 
-    html_parts = set()
-    text_parts = set()
-
-    for body_part in email.text_body:
-        if body_part.type == "text/html":
-            html_parts.add(body_part.part_id)
-        else:
-            text_parts.add(body_part.part_id)
-    for body_part in email.html_body:
-        if body_part.type == "text/html":
-            html_parts.add(body_part.part_id)
-        else:
-            text_parts.add(body_part.part_id)
-
-    body_text = ""
+    # Dicts dedupe part IDs shared by text_body and html_body while keeping
+    # the parts in message order
+    html_parts: dict[str, None] = {}
+    text_parts: dict[str, None] = {}
+
+    for body_part in chain(email.text_body, email.html_body):
+        parts = html_parts if body_part.type == "text/html" else text_parts
+        parts[body_part.part_id] = None
+
     if html_parts:
-        for part_id in html_parts:
-            body_text += (
-                BeautifulSoup(
-                    email.body_values.get(part_id).value, "html.parser"
-                ).get_text()
-                + "\n"
-            )
-    elif text_parts:
-        for part_id in text_parts:
-            body_text += email.body_values.get(part_id).value + "\n"
-    return normalize_whitespace(body_text)
+        chunks = [
+            html_to_text(email.body_values.get(part_id).value)
+            for part_id in html_parts
+        ]
+    else:
+        chunks = [email.body_values.get(part_id).value for part_id in text_parts]
+    return normalize_whitespace("\n".join(chunks))
 
 
 def get_client(api_token: str) -> Client:
-    """Create and return a Fastmail JMAP client instance."""
+    """Create and return a Fastmail JMAP client instance.
+
+    Clients are cached per API token for CLIENT_CACHE_TTL seconds so the JMAP
+    session and the underlying HTTP connection are reused across tool calls.
+    """
+    with _client_cache_lock:
+        cached = _client_cache.get(api_token)
+        if cached and time.monotonic() - cached[0] < CLIENT_CACHE_TTL:
+            return cached[1]
+
     logger.debug("Creating Fastmail client")
     client = Client.create_with_api_token(host=FASTMAIL_API_HOST, api_token=api_token)
+    client.requests_session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=Retry(total=2, backoff_factor=0.3),
+        ),
+    )
+
+    with _client_cache_lock:
+        # Re-insert so the dict stays ordered by creation time
+        _client_cache.pop(api_token, None)
+        if len(_client_cache) >= CLIENT_CACHE_SIZE:
+            del _client_cache[next(iter(_client_cache))]
+        _client_cache[api_token] = (time.monotonic(), client)
     return client
 
 
-def get_mailbox_id_for_role(client: Client, role: str) -> str | None:
-    """Get the ID of the mailbox for a specific role."""
-    logger.debug("Fetching mailbox ID for role: %s", role)
-    results = client.request(
-        [
-            MailboxQuery(filter=MailboxQueryFilterCondition(role=role)),
-            MailboxGet(ids=Ref("/ids")),
-        ]
-    )
+def get_mailbox_ids_for_roles(
+    client: Client, roles: list[str]
+) -> dict[str, str | None]:
+    """Get the IDs of the mailboxes for several roles in a single request.
+
+    Mailbox IDs are cached per account for MAILBOX_CACHE_TTL seconds, since
+    they almost never change. On a cache miss, every mailbox with a role is
+    fetched with one Mailbox/get call, so later lookups for other roles (e.g.
+    trash and junk after inbox) are also served from the cache.
+    """
+    account_id = client.account_id
+    mailbox_ids: dict[str, str | None] = {}
+    for role in roles:
+        cached = _mailbox_id_cache.get((account_id, role))
+        if cached and time.monotonic() - cached[0] < MAILBOX_CACHE_TTL:
+            mailbox_ids[role] = cached[1]
+
+    missing_roles = [role for role in roles if role not in mailbox_ids]
+    if not missing_roles:
+        return mailbox_ids
+
+    logger.debug("Fetching mailbox IDs for roles: %s", ", ".join(missing_roles))
+    results = client.request([MailboxGet(ids=None, properties=["id", "role"])])
     assert isinstance(
-        results[1].response, MailboxGetResponse
+        results[0].response, MailboxGetResponse
     ), "Error in Mailbox/get method"
-    mailbox_data = results[1].response.data
-    if not mailbox_data:
-        return None
 
-    mailbox_id = mailbox_data[0].id
-    assert mailbox_id
-    return mailbox_id
+    fetched_at = time.monotonic()
+    for mailbox in results[0].response.data:
+        if mailbox.role and mailbox.id:
+            _mailbox_id_cache[(account_id, mailbox.role)] = (fetched_at, mailbox.id)
+            mailbox_ids[mailbox.role] = mailbox.id
+
+    return {role: mailbox_ids.get(role) for role in roles}
+
+
+def get_mailbox_id_for_role(client: Client, role: str) -> str | None:
+    """Get the ID of the mailbox for a specific role."""
+    return get_mailbox_ids_for_roles(client, [role])[role]
 
 
 def fastmail_list_inbox_emails(api_token: str, offset: int = 0) -> EmailPage:
@@ -150,7 +233,7 @@ def fastmail_list_inbox_emails(api_token: str, offset: int = 0) -> EmailPage:
                 position=offset,
                 limit=30,
             ),
-            EmailGet(ids=Ref("/ids")),
+            EmailGet(ids=Ref("/ids"), properties=EMAIL_LIST_PROPERTIES),
         ]
     )
 
@@ -193,10 +276,8 @@ def fastmail_query_emails_by_keyword(
     logger.debug("Querying emails for keyword '%s' (offset=%s)", keyword, offset)
     client = get_client(api_token)
 
-    trash_id = get_mailbox_id_for_role(client, "trash")
-    junk_id = get_mailbox_id_for_role(client, "junk")
-
-    exclude_mailboxes = list(filter(None, [trash_id, junk_id]))
+    mailbox_ids = get_mailbox_ids_for_roles(client, ["trash", "junk"])
+    exclude_mailboxes = list(filter(None, mailbox_ids.values()))
 
     filter_params: dict[str, str | list[str]] = {"text": keyword}
     if exclude_mailboxes:
@@ -211,7 +292,7 @@ def fastmail_query_emails_by_keyword(
                 calculate_total=True,
                 limit=30,
             ),
-            EmailGet(ids=Ref("/ids")),
+            EmailGet(ids=Ref("/ids"), properties=EMAIL_LIST_PROPERTIES),
         ]
     )
 
@@ -237,8 +318,13 @@ def fastmail_query_emails_by_keyword(
     )
 
 
-def fastmail_get_email_content(api_token: str, email_id: str) -> str:
-    """Get the content of an email by its ID."""
+@functools.lru_cache(maxsize=EMAIL_CONTENT_CACHE_SIZE)
+def _get_email_content(api_token: str, email_id: str) -> str:
+    """Fetch the content of an email by its ID.
+
+    Email bodies never change, so results are cached. A missing email raises
+    EmailNotFound instead, which lru_cache does not cache.
+    """
     logger.debug("Retrieving content for email %s", email_id)
     client = get_client(api_token)
     results = client.request(
@@ -252,9 +338,17 @@ def fastmail_get_email_content(api_token: str, email_id: str) -> str:
     )
     email_data = results[0].response.data
     if not email_data:
-        return "No email found with the given ID."
+        raise EmailNotFound(email_id)
 
     email = email_data[0]
     content = get_body_as_text(email)
     logger.debug("Retrieved email content length %s", len(content))
     return content
+
+
+def fastmail_get_email_content(api_token: str, email_id: str) -> str:
+    """Get the content of an email by its ID."""
+    try:
+        return _get_email_content(api_token, email_id)
+    except EmailNotFound:
+        return "No email found with the given ID."
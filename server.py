@@ -1,14 +1,15 @@
 """Basic Fastmail MCP Server"""
 
 import os
+import json
+import asyncio
+import hmac
 import logging
 
 from dotenv import load_dotenv
 from fastmcp import FastMCP
 from fastmcp.server.dependencies import get_http_request
-from starlette.requests import Request
-from starlette.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 import uvicorn
 from fastmail import (
     EmailPage,
@@ -17,37 +18,63 @@ from fastmail import (
     fastmail_query_emails_by_keyword,
 )
 
-load_dotenv()
+
+def get_log_level() -> int:
+    """Get the logging level from the LOG_LEVEL environment variable."""
+    return getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
 
 # Configure logging
-log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
-    level=getattr(logging, log_level, logging.INFO),
+    level=get_log_level(),
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
 
-# Static key from the environment for authorization
-BEARER_TOKEN = os.getenv("BEARER_TOKEN")
-if not BEARER_TOKEN:
-    raise ValueError("BEARER_TOKEN environment variable is not set.")
-
+# The 401 body and headers never change, so they are rendered once. Each
+# response still gets its own header list, since outer middleware may edit it.
+_UNAUTHORIZED_BODY = json.dumps({"error": "Unauthorized"}).encode()
+_UNAUTHORIZED_HEADERS = (
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_UNAUTHORIZED_BODY)).encode()),
+    (b"www-authenticate", b'Bearer realm="FastMCP"'),
+)
 
-class BearerAuthMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle Bearer token authentication."""
 
-    async def dispatch(self, request: Request, call_next):
-        auth = request.headers.get("authorization", "")
-        if not auth.startswith("Bearer ") or auth.split(" ", 1)[1] != BEARER_TOKEN:
-            logger.warning("Unauthorized request to %s", request.url.path)
-            return JSONResponse(
-                content={"error": "Unauthorized"},
-                status_code=401,
-                headers={"WWW-Authenticate": 'Bearer realm="FastMCP"'},
+class BearerAuthMiddleware:
+    """ASGI middleware to handle Bearer token authentication."""
+
+    def __init__(self, app: ASGIApp, token: str):
+        self.app = app
+        if not token:
+            raise ValueError("Bearer token must not be empty.")
+        # Precomputed for a constant-time comparison against the header
+        self._expected_auth = f"Bearer {token}".encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        auth = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth = value
+                break
+
+        if not hmac.compare_digest(auth, self._expected_auth):
+            logger.warning("Unauthorized request to %s", scope["path"])
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": list(_UNAUTHORIZED_HEADERS),
+                }
             )
+            await send({"type": "http.response.body", "body": _UNAUTHORIZED_BODY})
+            return
 
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
 
 def get_fastmail_api_token() -> str:
@@ -73,12 +100,13 @@ def display_email_page(email_page: EmailPage) -> str:
     )
 
 
-# Initialize the MCP server
+# Initialize the MCP server. Tools are async and run the blocking jmapc calls
+# in worker threads so concurrent tool calls do not stall the event loop.
 mcp = FastMCP("Fastmail Manager")
 
 
 @mcp.tool(name="list_inbox_emails")
-def list_inbox_emails(offset: int) -> str:
+async def list_inbox_emails(offset: int) -> str:
     """List all emails in the inbox.
 
     Returns:
@@ -86,8 +114,8 @@ def list_inbox_emails(offset: int) -> str:
     """
     logger.info("Listing inbox emails (offset=%s)", offset)
     fastmail_api_token = get_fastmail_api_token()
-    email_page: EmailPage = fastmail_list_inbox_emails(
-        fastmail_api_token, offset=offset
+    email_page: EmailPage = await asyncio.to_thread(
+        fastmail_list_inbox_emails, fastmail_api_token, offset=offset
     )
     logger.debug("Retrieved %s emails", len(email_page.emails))
     if not email_page.emails:
@@ -97,7 +125,7 @@ def list_inbox_emails(offset: int) -> str:
 
 
 @mcp.tool(name="query_emails_by_keyword")
-def query_emails_by_keyword(keyword: str, offset: int = 0) -> str:
+async def query_emails_by_keyword(keyword: str, offset: int = 0) -> str:
     """Query emails in the inbox by a keyword in the subject or body.
 
     Args:
@@ -112,8 +140,11 @@ def query_emails_by_keyword(keyword: str, offset: int = 0) -> str:
     if not keyword:
         return "Keyword is required for searching emails."
     try:
-        email_page: EmailPage = fastmail_query_emails_by_keyword(
-            fastmail_api_token, keyword, offset=offset
+        email_page: EmailPage = await asyncio.to_thread(
+            fastmail_query_emails_by_keyword,
+            fastmail_api_token,
+            keyword,
+            offset=offset,
         )
         logger.debug("Query returned %s emails", len(email_page.emails))
         if not email_page.emails:
@@ -129,7 +160,7 @@ def query_emails_by_keyword(keyword: str, offset: int = 0) -> str:
 
 
 @mcp.tool(name="get_email_content")
-def get_email_content(email_id: str) -> str:
+async def get_email_content(email_id: str) -> str:
     """Get the content of an email by its ID.
 
     Args:
@@ -144,7 +175,9 @@ def get_email_content(email_id: str) -> str:
     if not email_id:
         return "Email ID is required."
     try:
-        content = fastmail_get_email_content(fastmail_api_token, email_id)
+        content = await asyncio.to_thread(
+            fastmail_get_email_content, fastmail_api_token, email_id
+        )
         logger.debug("Retrieved content length %s", len(content))
         return f"Content of email {email_id}:\n{content}"
     except ValueError as e:
@@ -152,10 +185,34 @@ def get_email_content(email_id: str) -> str:
         return f"Error retrieving email content: {str(e)}"
 
 
-if __name__ == "__main__":
+def create_app(token: str | None = None):
+    """Create the ASGI app serving the MCP server over streamable HTTP.
+
+    Settings are loaded from .env here rather than at import, and a missing
+    token raises immediately so a misconfigured server fails at startup.
+
+    Args:
+        token: Bearer token clients must send. Defaults to the BEARER_TOKEN
+            environment variable.
+    """
+    load_dotenv()
+    logging.getLogger().setLevel(get_log_level())
+    if token is None:
+        token = os.getenv("BEARER_TOKEN")
+        if not token:
+            raise ValueError("BEARER_TOKEN environment variable is not set.")
+    elif not token:
+        raise ValueError("Bearer token must not be empty.")
+
     mcp.settings.stateless_http = True
     app = mcp.http_app()
-    app.add_middleware(BearerAuthMiddleware)
+    app.add_middleware(BearerAuthMiddleware, token=token)
+    return app
+
 
+if __name__ == "__main__":
     logger.info("Starting Fastmail MCP server on http://127.0.0.1:8000")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # uvicorn calls the create_app factory in each worker, reads the worker
+    # count from WEB_CONCURRENCY and uses uvloop and httptools automatically
+    # when they are installed
+    uvicorn.run("server:create_app", factory=True, host="127.0.0.1", port=8000)
@@ -1,20 +1,13 @@
-import os
-import sys
-from pathlib import Path
-
+import pytest
 from starlette.applications import Starlette
 from starlette.responses import PlainTextResponse
 from starlette.routing import Route
 from starlette.testclient import TestClient
 
-# ensure project root is on the path
-sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import server
+from server import BearerAuthMiddleware
 
-# Set up test token before importing the middleware
 TEST_TOKEN = "test-token"
-os.environ["BEARER_TOKEN"] = TEST_TOKEN
-
-from server import BearerAuthMiddleware
 
 
 def dummy_endpoint(request):
@@ -23,29 +16,75 @@ def dummy_endpoint(request):
 
 def create_app():
     app = Starlette(routes=[Route("/dummy", dummy_endpoint)])
-    app.add_middleware(BearerAuthMiddleware)
+    app.add_middleware(BearerAuthMiddleware, token=TEST_TOKEN)
     return app
 
 
-def test_missing_authorization_header():
-    app = create_app()
-    with TestClient(app) as client:
-        response = client.get("/dummy")
+@pytest.fixture(scope="module")
+def client():
+    # The dummy app has no lifespan to run, so the client is used without
+    # entering it as a context manager
+    return TestClient(create_app())
+
+
+def test_missing_authorization_header(client):
+    response = client.get("/dummy")
     assert response.status_code == 401
 
 
-def test_incorrect_token():
-    app = create_app()
-    with TestClient(app) as client:
-        response = client.get("/dummy", headers={"Authorization": "Bearer wrong"})
+def test_incorrect_token(client):
+    response = client.get("/dummy", headers={"Authorization": "Bearer wrong"})
     assert response.status_code == 401
 
 
-def test_correct_token():
-    app = create_app()
-    with TestClient(app) as client:
-        response = client.get(
-            "/dummy", headers={"Authorization": f"Bearer {TEST_TOKEN}"}
-        )
+def test_unauthorized_response_body(client):
+    response = client.get("/dummy", headers={"Authorization": "Basic abc"})
+    assert response.status_code == 401
+    assert response.json() == {"error": "Unauthorized"}
+    assert response.headers["www-authenticate"] == 'Bearer realm="FastMCP"'
+
+
+def test_unauthorized_headers_are_not_shared():
+    inner = create_app()
+
+    async def add_header(scope, receive, send):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"].append((b"x-extra", b"1"))
+            await send(message)
+
+        await inner(scope, receive, send_with_header)
+
+    client = TestClient(add_header)
+    client.get("/dummy")
+    response = client.get("/dummy")
+    assert response.headers.get_list("x-extra") == ["1"]
+
+
+def test_correct_token(client):
+    response = client.get(
+        "/dummy", headers={"Authorization": f"Bearer {TEST_TOKEN}"}
+    )
     assert response.status_code == 200
     assert response.text == "ok"
+
+
+def test_create_app_reads_token_from_environment(monkeypatch):
+    monkeypatch.setenv("BEARER_TOKEN", "env-token")
+    app = server.create_app()
+    assert app.user_middleware[0].kwargs["token"] == "env-token"
+
+
+def test_create_app_fails_without_token(monkeypatch):
+    monkeypatch.setattr(server, "load_dotenv", lambda: None)
+    monkeypatch.delenv("BEARER_TOKEN", raising=False)
+    with pytest.raises(ValueError):
+        server.create_app()
+
+
+def test_empty_token_is_rejected(monkeypatch):
+    monkeypatch.setenv("BEARER_TOKEN", "env-token")
+    with pytest.raises(ValueError):
+        server.create_app(token="")
+    with pytest.raises(ValueError):
+        BearerAuthMiddleware(dummy_endpoint, token="")
@@ -1,13 +1,21 @@
 import pytest
 import types
 from unittest.mock import patch, MagicMock
-from pathlib import Path
-import sys
 
-sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 import fastmail
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    fastmail._mailbox_id_cache.clear()
+    fastmail._client_cache.clear()
+    fastmail._get_email_content.cache_clear()
+    yield
+    fastmail._mailbox_id_cache.clear()
+    fastmail._client_cache.clear()
+    fastmail._get_email_content.cache_clear()
+
+
 def _make_email(id="e1", sender="Sender", email="s@example.com", subject="Subj", date="2024-01-01"):
     addr = types.SimpleNamespace(name=sender, email=email)
     return types.SimpleNamespace(
@@ -35,6 +43,9 @@ def test_fastmail_list_inbox_emails(mock_get_mailbox, mock_get_client):
 
     page = fastmail.fastmail_list_inbox_emails("token")
 
+    email_get = client.request.call_args.args[0][1]
+    assert email_get.properties == fastmail.EMAIL_LIST_PROPERTIES
+
     expected = fastmail.Email(
         id="e1",
         sender="Sender <s@example.com>",
@@ -54,11 +65,11 @@ def test_fastmail_list_inbox_emails_mailbox_missing(mock_get_mailbox, mock_get_c
 
 
 @patch("fastmail.get_client")
-@patch("fastmail.get_mailbox_id_for_role")
-def test_fastmail_query_emails_by_keyword_empty(mock_get_mailbox, mock_get_client):
+@patch("fastmail.get_mailbox_ids_for_roles")
+def test_fastmail_query_emails_by_keyword_empty(mock_get_mailboxes, mock_get_client):
     client = MagicMock()
     mock_get_client.return_value = client
-    mock_get_mailbox.side_effect = ["trash-id", "junk-id"]
+    mock_get_mailboxes.return_value = {"trash": "trash-id", "junk": "junk-id"}
     client.request.return_value = [
         types.SimpleNamespace(response=types.SimpleNamespace(position=2, total=0)),
         types.SimpleNamespace(response=types.SimpleNamespace(data=[])),
@@ -69,11 +80,11 @@ def test_fastmail_query_emails_by_keyword_empty(mock_get_mailbox, mock_get_clien
 
 
 @patch("fastmail.get_client")
-@patch("fastmail.get_mailbox_id_for_role")
-def test_fastmail_query_emails_by_keyword_pagination(mock_get_mailbox, mock_get_client):
+@patch("fastmail.get_mailbox_ids_for_roles")
+def test_fastmail_query_emails_by_keyword_pagination(mock_get_mailboxes, mock_get_client):
     client = MagicMock()
     mock_get_client.return_value = client
-    mock_get_mailbox.side_effect = ["trash-id", "junk-id"]
+    mock_get_mailboxes.return_value = {"trash": "trash-id", "junk": "junk-id"}
     email = _make_email()
     client.request.return_value = [
         types.SimpleNamespace(response=types.SimpleNamespace(position=5, total=10)),
@@ -86,6 +97,88 @@ def test_fastmail_query_emails_by_keyword_pagination(mock_get_mailbox, mock_get_
     assert page.emails[0].id == "e1"
 
 
+@patch("fastmail.Client.create_with_api_token")
+def test_get_client_is_cached_per_token(mock_create):
+    mock_create.side_effect = lambda host, api_token: MagicMock(name=api_token)
+
+    client = fastmail.get_client("token-a")
+
+    assert fastmail.get_client("token-a") is client
+    assert fastmail.get_client("token-b") is not client
+    assert mock_create.call_count == 2
+
+
+@patch("fastmail.time.monotonic")
+@patch("fastmail.Client.create_with_api_token")
+def test_get_client_expires_after_ttl(mock_create, mock_monotonic):
+    mock_create.side_effect = lambda host, api_token: MagicMock(name=api_token)
+    mock_monotonic.return_value = 1000.0
+    client = fastmail.get_client("token")
+
+    mock_monotonic.return_value = 1000.0 + fastmail.CLIENT_CACHE_TTL - 1
+    assert fastmail.get_client("token") is client
+
+    mock_monotonic.return_value = 1000.0 + fastmail.CLIENT_CACHE_TTL
+    assert fastmail.get_client("token") is not client
+    assert mock_create.call_count == 2
+
+
+@patch("fastmail.Client.create_with_api_token")
+def test_get_client_evicts_oldest_when_full(mock_create, monkeypatch):
+    mock_create.side_effect = lambda host, api_token: MagicMock(name=api_token)
+    monkeypatch.setattr(fastmail, "CLIENT_CACHE_SIZE", 2)
+
+    fastmail.get_client("token-a")
+    fastmail.get_client("token-b")
+    fastmail.get_client("token-c")
+
+    assert list(fastmail._client_cache) == ["token-b", "token-c"]
+
+
+def test_get_client_configures_connection_pool():
+    client = fastmail.get_client("token")
+
+    adapter = client.requests_session.get_adapter("https://api.fastmail.com")
+    assert adapter._pool_maxsize == fastmail.HTTP_POOL_SIZE
+    assert adapter.max_retries.total == 2
+
+
+def _mailbox_response(*mailboxes):
+    data = [types.SimpleNamespace(id=id, role=role) for id, role in mailboxes]
+    return [
+        types.SimpleNamespace(
+            response=MagicMock(spec=fastmail.MailboxGetResponse, data=data)
+        )
+    ]
+
+
+def test_get_mailbox_id_for_role_is_cached():
+    client = MagicMock()
+    client.account_id = "acct"
+    client.request.return_value = _mailbox_response(("inbox123", "inbox"))
+
+    assert fastmail.get_mailbox_id_for_role(client, "inbox") == "inbox123"
+    assert fastmail.get_mailbox_id_for_role(client, "inbox") == "inbox123"
+    client.request.assert_called_once()
+
+
+def test_get_mailbox_ids_for_roles_caches_all_roles():
+    client = MagicMock()
+    client.account_id = "acct"
+    client.request.return_value = _mailbox_response(
+        ("inbox123", "inbox"), ("trash-id", "trash"), ("folder", None)
+    )
+
+    assert fastmail.get_mailbox_id_for_role(client, "inbox") == "inbox123"
+    # trash was cached by the inbox lookup
+    assert fastmail.get_mailbox_id_for_role(client, "trash") == "trash-id"
+    client.request.assert_called_once()
+
+    mailbox_ids = fastmail.get_mailbox_ids_for_roles(client, ["trash", "junk"])
+    assert mailbox_ids == {"trash": "trash-id", "junk": None}
+    assert client.request.call_count == 2
+
+
 @patch("fastmail.get_client")
 def test_fastmail_get_email_content_found(mock_get_client):
     client = MagicMock()
@@ -107,3 +200,29 @@ def test_fastmail_get_email_content_not_found(mock_get_client):
     ]
     content = fastmail.fastmail_get_email_content("token", "e1")
     assert content == "No email found with the given ID."
+
+
+@patch("fastmail.get_client")
+def test_fastmail_get_email_content_is_cached(mock_get_client):
+    client = MagicMock()
+    mock_get_client.return_value = client
+    client.request.return_value = [
+        types.SimpleNamespace(response=types.SimpleNamespace(data=[_make_email()])),
+    ]
+
+    assert fastmail.fastmail_get_email_content("token", "e1") == "body"
+    assert fastmail.fastmail_get_email_content("token", "e1") == "body"
+    client.request.assert_called_once()
+
+
+@patch("fastmail.get_client")
+def test_fastmail_get_email_content_not_found_is_not_cached(mock_get_client):
+    client = MagicMock()
+    mock_get_client.return_value = client
+    client.request.return_value = [
+        types.SimpleNamespace(response=types.SimpleNamespace(data=[])),
+    ]
+
+    fastmail.fastmail_get_email_content("token", "e1")
+    fastmail.fastmail_get_email_content("token", "e1")
+    assert client.request.call_count == 2
@@ -1,43 +1,19 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-
 import types
-from dataclasses import dataclass
 
 import pytest
 
-from fastmail import format_addresses, normalize_whitespace, get_body_as_text
-
-
-@dataclass
-class MockAddress:
-    email: str
-    name: str | None = None
-
-
-@dataclass
-class MockBodyPart:
-    part_id: str
-    type: str
-
-
-@dataclass
-class MockBodyValue:
-    value: str
-
-
-@dataclass
-class MockEmail:
-    text_body: list[MockBodyPart]
-    html_body: list[MockBodyPart]
-    body_values: dict[str, MockBodyValue]
+from fastmail import (
+    format_addresses,
+    normalize_whitespace,
+    get_body_as_text,
+    html_to_text,
+)
 
 
 def test_format_addresses_with_display_names():
     addresses = [
-        MockAddress(email="bob@example.com", name="Bob"),
-        MockAddress(email="alice@example.com", name="Alice"),
+        types.SimpleNamespace(email="bob@example.com", name="Bob"),
+        types.SimpleNamespace(email="alice@example.com", name="Alice"),
     ]
     result = format_addresses(addresses)
     assert result == "Bob <bob@example.com>, Alice <alice@example.com>"
@@ -45,8 +21,8 @@ def test_format_addresses_with_display_names():
 
 def test_format_addresses_without_display_names():
     addresses = [
-        MockAddress(email="noname@example.com"),
-        MockAddress(email="emptyname@example.com", name=""),
+        types.SimpleNamespace(email="noname@example.com", name=None),
+        types.SimpleNamespace(email="emptyname@example.com", name=""),
     ]
     result = format_addresses(addresses)
     assert result == "noname@example.com, emptyname@example.com"
@@ -58,18 +34,49 @@ def test_normalize_whitespace_multiple_spaces_and_newlines():
     assert result == "Hello world\nThis is a test."
 
 
+def test_normalize_whitespace_clean_text():
+    assert normalize_whitespace(" Hello world\nAnother line\n") == (
+        "Hello world\nAnother line"
+    )
+
+
 def test_get_body_as_text_prefers_html_over_text():
-    text_part = MockBodyPart(part_id="1", type="text/plain")
-    html_part = MockBodyPart(part_id="2", type="text/html")
+    text_part = types.SimpleNamespace(part_id="1", type="text/plain")
+    html_part = types.SimpleNamespace(part_id="2", type="text/html")
 
-    email = MockEmail(
+    email = types.SimpleNamespace(
         text_body=[text_part],
         html_body=[html_part],
         body_values={
-            "1": MockBodyValue(value="Plain text body"),
-            "2": MockBodyValue(value="<p>Hello <b>World</b></p>"),
+            "1": types.SimpleNamespace(value="Plain text body"),
+            "2": types.SimpleNamespace(value="<p>Hello <b>World</b></p>"),
         },
     )
 
     result = get_body_as_text(email)
     assert result == "Hello World"
+
+
+def test_html_to_text_skips_script_and_style():
+    html = (
+        "<html><head><style>p { color: red; }</style></head>"
+        "<body><p>Hello</p><script>var x = 1;</script><p>World</p></body></html>"
+    )
+    assert html_to_text(html) == "HelloWorld"
+
+
+def test_get_body_as_text_keeps_part_order_without_duplicates():
+    first = types.SimpleNamespace(part_id="1", type="text/plain")
+    second = types.SimpleNamespace(part_id="2", type="text/plain")
+
+    email = types.SimpleNamespace(
+        text_body=[first, second],
+        html_body=[first, second],
+        body_values={
+            "1": types.SimpleNamespace(value="First part"),
+            "2": types.SimpleNamespace(value="Second part"),
+        },
+    )
+
+    result = get_body_as_text(email)
+    assert result == "First part\nSecond part"
@@ -1,27 +1,33 @@
-import os
 import json
-from unittest.mock import patch
-from pathlib import Path
-import sys
 
+import pytest
 from starlette.testclient import TestClient
 
-sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-
-# Set token before importing server
-TEST_TOKEN = "test-token"
-os.environ["BEARER_TOKEN"] = TEST_TOKEN
-
 import server
 from fastmail import EmailPage, Email
 
+TEST_TOKEN = "test-token"
+
 
 def create_app():
-    server.mcp.settings.stateless_http = True
     server.mcp.settings.json_response = True
-    app = server.mcp.http_app()
-    app.add_middleware(server.BearerAuthMiddleware)
-    return app
+    return server.create_app(token=TEST_TOKEN)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Build the MCP app and run its lifespan once for all endpoint tests
+    with TestClient(create_app()) as client:
+        yield client
+
+
+# Request headers are the same for every call, so build them once
+HEADERS = {
+    "Authorization": f"Bearer {TEST_TOKEN}",
+    "accept": "application/json, text/event-stream",
+    "content-type": "application/json",
+}
+HEADERS_WITH_API_TOKEN = {**HEADERS, "fastmail-api-token": "api-token"}
 
 
 def call_tool(client: TestClient, name: str, args: dict | None = None, *, include_api_token: bool = True):
@@ -31,68 +37,82 @@ def call_tool(client: TestClient, name: str, args: dict | None = None, *, includ
         "method": "tools/call",
         "params": {"name": name, "arguments": args or {}},
     }
-    headers = {
-        "Authorization": f"Bearer {TEST_TOKEN}",
-        "accept": "application/json, text/event-stream",
-        "content-type": "application/json",
-    }
-    if include_api_token:
-        headers["fastmail-api-token"] = "api-token"
+    headers = HEADERS_WITH_API_TOKEN if include_api_token else HEADERS
     # httpx deprecated using `data` with raw JSON strings. Use `content` to
     # avoid deprecation warnings when posting JSON payloads.
     return client.post("/mcp/", content=json.dumps(message), headers=headers)
 
 
-def test_list_inbox_emails_endpoint():
-    app = create_app()
+def test_display_email_page():
     page = EmailPage(
-        emails=[Email(id="e1", sender="Alice <a@example.com>", subject="Hi", date="2024-01-02")],
-        offset=0,
-        total=1,
+        emails=[
+            Email(id="e1", sender="Alice <a@example.com>", subject="Hi", date="2024-01-02"),
+            Email(id="e2", sender="b@example.com", subject="Re: Hi", date="2024-01-03"),
+        ],
+        offset=30,
+        total=32,
     )
-    expected = server.display_email_page(page)
-    with patch("server.fastmail_list_inbox_emails", return_value=page):
-        with TestClient(app) as client:
-            resp = call_tool(client, "list_inbox_emails", {"offset": 0})
-    assert resp.status_code == 200
-    data = resp.json()
-    assert data["result"]["isError"] is False
-    assert data["result"]["content"][0]["text"] == expected
-
-
-def test_query_emails_by_keyword_endpoint():
-    app = create_app()
-    page = EmailPage(
-        emails=[Email(id="e1", sender="Bob <b@example.com>", subject="Meeting", date="2024-02-03")],
-        offset=0,
-        total=1,
+    assert server.display_email_page(page) == (
+        "Total emails: 32\n"
+        "Current page (offset 30) of emails:\n"
+        "email_id: e1\nFrom: Alice <a@example.com>\nSubject: Hi\nDate: 2024-01-02\n"
+        "\n"
+        "email_id: e2\nFrom: b@example.com\nSubject: Re: Hi\nDate: 2024-01-03\n"
     )
-    expected = server.display_email_page(page)
-    with patch("server.fastmail_query_emails_by_keyword", return_value=page):
-        with TestClient(app) as client:
-            resp = call_tool(client, "query_emails_by_keyword", {"keyword": "meet", "offset": 0})
-    assert resp.status_code == 200
-    data = resp.json()
-    assert not data["result"]["isError"]
-    assert data["result"]["content"][0]["text"] == expected
 
 
-def test_get_email_content_endpoint():
-    app = create_app()
-    with patch("server.fastmail_get_email_content", return_value="the body"):
-        with TestClient(app) as client:
-            resp = call_tool(client, "get_email_content", {"email_id": "e1"})
+INBOX_PAGE = EmailPage(
+    emails=[Email(id="e1", sender="Alice <a@example.com>", subject="Hi", date="2024-01-02")],
+    offset=0,
+    total=1,
+)
+KEYWORD_PAGE = EmailPage(
+    emails=[Email(id="e1", sender="Bob <b@example.com>", subject="Meeting", date="2024-02-03")],
+    offset=0,
+    total=1,
+)
+
+# (tool name, arguments, patched helper, helper return value, expected text)
+CASES = [
+    (
+        "list_inbox_emails",
+        {"offset": 0},
+        "fastmail_list_inbox_emails",
+        INBOX_PAGE,
+        server.display_email_page(INBOX_PAGE),
+    ),
+    (
+        "query_emails_by_keyword",
+        {"keyword": "meet", "offset": 0},
+        "fastmail_query_emails_by_keyword",
+        KEYWORD_PAGE,
+        server.display_email_page(KEYWORD_PAGE),
+    ),
+    (
+        "get_email_content",
+        {"email_id": "e1"},
+        "fastmail_get_email_content",
+        "the body",
+        "Content of email e1:\nthe body",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "name,args,target,ret,expected", CASES, ids=[case[0] for case in CASES]
+)
+def test_tool_endpoint(client, monkeypatch, name, args, target, ret, expected):
+    monkeypatch.setattr(server, target, lambda *a, **k: ret)
+    resp = call_tool(client, name, args)
     assert resp.status_code == 200
     data = resp.json()
     assert data["result"]["isError"] is False
-    assert data["result"]["content"][0]["text"] == "Content of email e1:\nthe body"
+    assert data["result"]["content"][0]["text"] == expected
 
 
-def test_missing_api_token_header():
-    app = create_app()
-    with patch("server.fastmail_list_inbox_emails", return_value=None):
-        with TestClient(app) as client:
-            resp = call_tool(client, "list_inbox_emails", {"offset": 0}, include_api_token=False)
+def test_missing_api_token_header(client, monkeypatch):
+    monkeypatch.setattr(server, "fastmail_list_inbox_emails", lambda *a, **k: None)
+    resp = call_tool(client, "list_inbox_emails", {"offset": 0}, include_api_token=False)
     assert resp.status_code == 200
     data = resp.json()
     assert data["result"]["isError"] is True